@@ -7,17 +7,28 @@
 """
 from __future__ import annotations
 
+import argparse
+import asyncio
+import csv
+import functools
+import hashlib
+import io
+import json
 import logging
+import mmap
 import os
+import re
 import shutil
 import sys
 import tempfile
+import threading
 import time
 import zlib
 import subprocess
 import platform
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 # optional keyring
 try:
@@ -26,6 +37,19 @@ try:
 except Exception:
     KEYRING_AVAILABLE = False
 
+# optional psutil: проверка процессов без запуска pgrep/tasklist
+try:
+    import psutil  # type: ignore
+    PSUTIL_AVAILABLE = True
+except Exception:
+    PSUTIL_AVAILABLE = False
+
+# fcntl есть только на POSIX
+try:
+    import fcntl  # type: ignore
+except ImportError:
+    fcntl = None  # type: ignore
+
 import requests
 import vdf
 from PIL import Image
@@ -38,13 +62,57 @@ KEYRING_USERNAME = "default"
 ENV_API_KEY = "STEAMGRIDDB_API_KEY"
 HTTP_TIMEOUT = (5, 20)              # (connect, read) seconds
 REQUEST_RETRIES = 3
+HTTP_POOL_SIZE = 20                 # соединений в пуле HTTPAdapter
+IMAGE_WORKERS = 5                   # параллельных загрузок арт-ресурсов
+DOWNLOAD_CHUNK_SIZE = 64 * 1024     # bytes
 BACKUP_DIRNAME = "backups_shortcuts"
+BACKUP_KEEP = 10                    # сколько последних бэкапов хранить на файл
+LOCK_WAIT_TIMEOUT = 5.0             # seconds
+LOCK_POLL_INTERVAL = 0.1            # seconds
+PRECONDITION_LOCK_TIMEOUT = 1.0     # seconds; сколько ждать flock перед сверкой SHA-256
+CACHE_DIR = Path(os.path.expanduser("~/.cache/nonsteam-adder/sgdb"))
+CACHE_TTL = 7 * 24 * 3600           # seconds
+MMAP_THRESHOLD = 64 * 1024          # bytes; файлы крупнее читаются через mmap
+GRID_PORTRAIT_DIMENSIONS = ("600x900", "342x482", "660x930")
+GRID_WIDE_DIMENSIONS = ("920x430",)
+SHORTCUTS_WRITE_ATTEMPTS = 3        # повторов read-modify-write при конкурентном изменении
+APPEND_FAST_PATH_MIN_SIZE = 64 * 1024  # bytes; меньшие shortcuts.vdf просто перезаписываются целиком
 # ------------------------------------
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("nonsteam-adder")
 
 
+class StalePrecondition(RuntimeError):
+    """Файл изменён другим процессом между чтением и записью (не совпал SHA-256)."""
+
+
+_PERSONA_RE = re.compile(rb'"PersonaName"\s*"((?:[^"\\]|\\.)*)"')
+# те же escape-последовательности, что снимает vdf.load
+_VDF_UNESCAPE = {
+    r"\n": "\n", r"\t": "\t", r"\v": "\v", r"\b": "\b", r"\r": "\r", r"\f": "\f", r"\a": "\a",
+    r"\\": "\\", r"\?": "?", r'\"': '"', r"\'": "'",
+}
+_VDF_UNESCAPE_RE = re.compile(r"""\\[ntvbrfa\\?"']""")
+
+
+def read_persona_name(localconfig: str) -> str:
+    """
+    Извлекает PersonaName из localconfig.vdf регулярным выражением, без полного разбора VDF
+    (файл бывает сотни КБ, а нужно одно поле). Крупные файлы сканируются через mmap без копирования.
+    """
+    with open(localconfig, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                m = _PERSONA_RE.search(mm)
+        else:
+            m = _PERSONA_RE.search(f.read())
+    if not m:
+        return "Unknown"
+    return _VDF_UNESCAPE_RE.sub(lambda e: _VDF_UNESCAPE[e.group()], m.group(1).decode("utf-8", "replace"))
+
+
 def default_steam_userdata_path() -> Path:
     """Возвращает путь к userdata в зависимости от платформы."""
     if sys.platform.startswith("win"):
@@ -59,13 +127,70 @@ def default_steam_userdata_path() -> Path:
 def requests_session_with_retries() -> requests.Session:
     """Requests.Session с политикой ретраев для устойчивости сетевых операций."""
     s = requests.Session()
-    retries = Retry(total=REQUEST_RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
-    adapter = HTTPAdapter(max_retries=retries)
+    retries = Retry(total=REQUEST_RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET", "HEAD"]))
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
     s.mount("http://", adapter)
     s.mount("https://", adapter)
     return s
 
 
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Общая для процесса Session (ленивая инициализация): все запросы идут на один хост
+    SteamGridDB, поэтому TCP/TLS соединения переиспользуются между экземплярами NonSteamGameAdder.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = requests_session_with_retries()
+    return _SESSION
+
+
+_MEMORY_CACHE: Dict[str, Dict] = {}
+
+
+def _cache_file(url: str) -> Path:
+    return CACHE_DIR / (hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest() + ".json")
+
+
+def load_cached_json(url: str) -> Optional[Dict]:
+    """Возвращает закэшированный JSON ответ SteamGridDB для url (память, затем диск) или None."""
+    if url in _MEMORY_CACHE:
+        return _MEMORY_CACHE[url]
+    path = _cache_file(url)
+    try:
+        if time.time() - path.stat().st_mtime > CACHE_TTL:
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug("Чтение кэша %s failed: %s", path, e)
+        return None
+    _MEMORY_CACHE[url] = payload
+    return payload
+
+
+def store_cached_json(url: str, payload: Dict):
+    """Сохраняет успешный JSON ответ в кэш; ошибки записи не критичны."""
+    _MEMORY_CACHE[url] = payload
+    path = _cache_file(url)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=str(path.parent), delete=False) as tf:
+            json.dump(payload, tf)
+        Path(tf.name).replace(path)
+    except Exception as e:
+        logger.debug("Запись кэша %s failed: %s", path, e)
+
+
 def get_api_key(interactive_save: bool = True) -> Optional[str]:
     """
     Получение SteamGridDB API key в порядке приоритета:
@@ -108,35 +233,167 @@ def get_api_key(interactive_save: bool = True) -> Optional[str]:
 
 
 def generate_appid(game_name: str, exe_path: str) -> str:
-    """Генерация уникального appid: crc32(exe+name) | 0x80000000 (как в оригинале)."""
-    unique = (exe_path + game_name).encode("utf-8")
-    legacy_id = zlib.crc32(unique) | 0x80000000
+    """
+    Генерация уникального appid: crc32(exe+name) | 0x80000000 (как в оригинале).
+    Нужен именно CRC-32 IEEE (полином zlib): crc32c и прочие полиномы сломают совместимость
+    appid со Steam. Вход — десятки байт, так что zlib.crc32 здесь не узкое место.
+    """
+    # crc32(a + b) == crc32(b, crc32(a)): считаем по частям без промежуточной конкатенации
+    crc = zlib.crc32(exe_path.encode("utf-8"))
+    crc = zlib.crc32(game_name.encode("utf-8"), crc)
+    legacy_id = crc | 0x80000000
     return str(legacy_id)
 
 
-def atomic_write_file_with_vdf(path: Path, write_callable):
+def fsync_directory(directory: Path):
+    """fsync каталога, чтобы rename пережил сбой питания. На Windows каталоги так не открываются — пропускаем."""
+    if os.name == "nt":
+        return
+    try:
+        dir_fd = os.open(str(directory), os.O_RDONLY)
+    except OSError as e:
+        logger.debug("Не удалось открыть каталог %s для fsync: %s", directory, e)
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError as e:
+        logger.debug("fsync каталога %s failed: %s", directory, e)
+    finally:
+        os.close(dir_fd)
+
+
+def copy_file_reflink(src: Path, dst: Path):
     """
-    Атомарная запись: создаём бэкап, пишем во временный файл в той же директории,
-    затем replace. write_callable(fp) — функция, принимающая открытый бинарный fp и пишущая в него vdf.
+    Копирование с попыткой reflink (btrfs/XFS через cp --reflink=auto, APFS через cp -c):
+    экстенты разделяются, данные не копируются. При неудаче — обычный shutil.copy2.
     """
-    path.parent.mkdir(parents=True, exist_ok=True)
-    if path.exists():
-        backup_dir = path.parent / BACKUP_DIRNAME
-        backup_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        backup_path = backup_dir / f"{path.name}.bak.{timestamp}"
+    cmd = None
+    if sys.platform.startswith("linux"):
+        cmd = ["cp", "--reflink=auto", "--preserve=mode,timestamps", str(src), str(dst)]
+    elif sys.platform.startswith("darwin"):
+        cmd = ["cp", "-c", "-p", str(src), str(dst)]
+    if cmd and shutil.which("cp"):
         try:
-            shutil.copy2(path, backup_path)
-            logger.info("Создан бэкап: %s", backup_path)
+            r = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            if r.returncode == 0:
+                return
         except Exception as e:
-            logger.warning("Не удалось создать бэкап: %s", e)
+            logger.debug("cp reflink failed: %s", e)
+    shutil.copy2(src, dst)
+
+
+def prune_backups(backup_dir: Path, name: str, keep: int = BACKUP_KEEP):
+    """
+    Удаляет старые бэкапы name, оставляя keep последних. Сортировка по имени: суффикс
+    <timestamp>-<counter> монотонен, а mtime копии унаследован от исходного файла.
+    """
+    backups = sorted(backup_dir.glob(f"{name}.bak.*"), key=lambda p: p.name)
+    for old in backups[:-keep] if keep > 0 else backups:
+        try:
+            old.unlink()
+            logger.debug("Удалён старый бэкап: %s", old)
+        except OSError as e:
+            logger.debug("Не удалось удалить бэкап %s: %s", old, e)
+
+
+def file_sha256(path: Path) -> bytes:
+    """SHA-256 содержимого файла; отсутствующий файл считается пустым."""
+    try:
+        return hashlib.sha256(path.read_bytes()).digest()
+    except FileNotFoundError:
+        return hashlib.sha256(b"").digest()
+
+
+def backup_file(path: Path):
+    """Копирует текущий path в BACKUP_DIRNAME (если файл есть) и оставляет BACKUP_KEEP последних бэкапов."""
+    if not path.exists():
+        return
+    backup_dir = path.parent / BACKUP_DIRNAME
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    counter = 0
+    backup_path = backup_dir / f"{path.name}.bak.{timestamp}-{counter:03d}"
+    while backup_path.exists():
+        counter += 1
+        backup_path = backup_dir / f"{path.name}.bak.{timestamp}-{counter:03d}"
+    try:
+        copy_file_reflink(path, backup_path)
+        logger.info("Создан бэкап: %s", backup_path)
+    except Exception as e:
+        logger.warning("Не удалось создать бэкап: %s", e)
+    prune_backups(backup_dir, path.name)
+
+
+def _replace_if_unchanged(tmp_path: Path, path: Path, expected_sha256: bytes):
+    """
+    Под кратким flock (POSIX) сверяет SHA-256 текущего path с ожидаемым и только тогда
+    делает бэкап и replace; иначе StalePrecondition.
+    """
+    lock_fp = None
+    try:
+        if fcntl is not None and path.exists():
+            lock_fp = path.open("rb")
+            # неблокирующий flock с ограниченным ожиданием: чужая долгая блокировка не должна подвесить скрипт
+            deadline = time.monotonic() + PRECONDITION_LOCK_TIMEOUT
+            while True:
+                try:
+                    fcntl.flock(lock_fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        raise StalePrecondition(f"{path} заблокирован другим процессом")
+                    time.sleep(LOCK_POLL_INTERVAL)
+        if file_sha256(path) != expected_sha256:
+            raise StalePrecondition(f"{path} изменён после чтения")
+        # бэкап только после успешной сверки: повторы из-за StalePrecondition не плодят копии
+        backup_file(path)
+        tmp_path.replace(path)
+    finally:
+        if lock_fp is not None:
+            lock_fp.close()
+
+
+def preallocate_file(fd: int, size: int):
+    """
+    Резервирует size байт под файл (posix_fallocate), чтобы блоки выделялись сразу и
+    непрерывно, а не отложенно при writeback. Где вызов недоступен (Windows, macOS,
+    файловые системы без поддержки) — тихо пропускаем.
+    """
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        logger.debug("posix_fallocate failed: %s", e)
+
+
+def atomic_write_file_with_vdf(path: Path, write_callable: Callable, expected_sha256: Optional[bytes] = None,
+                               size_hint: Optional[int] = None):
+    """
+    Атомарная запись: пишем во временный файл в той же директории, fsync файла, затем
+    бэкап текущего файла (хранятся BACKUP_KEEP последних), replace и fsync каталога. write_callable(fp) — функция, принимающая открытый бинарный fp и пишущая в него vdf.
+    Если задан expected_sha256 — replace выполняется только если path не менялся с момента чтения.
+    size_hint — ожидаемый размер: временный файл заранее преаллоцируется и затем обрезается по факту записи.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
 
     # пишем во временный файл в той же папке
     with tempfile.NamedTemporaryFile(dir=str(path.parent), delete=False) as tf:
         tmp_path = Path(tf.name)
     try:
         with tmp_path.open("wb") as f:
+            if size_hint:
+                preallocate_file(f.fileno(), size_hint)
             write_callable(f)
+            f.flush()
+            if size_hint:
+                os.ftruncate(f.fileno(), f.tell())
+            os.fsync(f.fileno())
+        if expected_sha256 is not None:
+            _replace_if_unchanged(tmp_path, path, expected_sha256)
+        else:
+            backup_file(path)
+            tmp_path.replace(path)
     except Exception as e:
         # очистить временный файл при ошибке
         try:
@@ -144,60 +401,180 @@ def atomic_write_file_with_vdf(path: Path, write_callable):
         except Exception:
             pass
         raise
-    tmp_path.replace(path)
+    fsync_directory(path.parent)
     logger.debug("Атомарная запись выполнена: %s", path)
 
 
-def load_shortcuts_binary(path: Path) -> Dict:
-    """Загружает бинарный shortcuts.vdf или возвращает новую структуру при отсутствии."""
+def load_shortcuts_binary(path: Path) -> Tuple[Dict, bytes]:
+    """
+    Загружает бинарный shortcuts.vdf или возвращает новую структуру при отсутствии.
+    Возвращает (data, sha256 прочитанного содержимого) для проверки при записи.
+    """
     if not path.exists():
         logger.info("shortcuts.vdf не найден, создаётся новая структура.")
-        return {"shortcuts": {}}
+        return {"shortcuts": {}}, hashlib.sha256(b"").digest()
     try:
-        with path.open("rb") as f:
-            data = vdf.binary_load(f)
+        raw = path.read_bytes()
+        data = vdf.binary_loads(raw)
         if "shortcuts" not in data:
             data.setdefault("shortcuts", {})
-        return data
+        return data, hashlib.sha256(raw).digest()
     except Exception as e:
         logger.error("Не удалось загрузить бинарный VDF %s: %s", path, e)
         raise
 
 
-def dump_shortcuts_binary(path: Path, shortcuts_obj: Dict):
+def serialize_shortcuts_binary(shortcuts_obj: Dict) -> bytes:
     """
-    Корректная запись бинарного VDF. Учитываем возможные варианты сигнатуры
+    Сериализует объект в бинарный VDF в памяти. Учитываем возможные варианты сигнатуры
     vdf.binary_dump(fp, obj) или vdf.binary_dump(obj, fp).
-    Производим атомарную запись через atomic_write_file_with_vdf.
     """
-    def writer(fp):
-        # пытаемся вызвать наиболее вероятную сигнатуру: binary_dump(fp, obj)
-        try:
-            vdf.binary_dump(fp, shortcuts_obj)
-            return
-        except TypeError as e:
-            logger.debug("vdf.binary_dump(fp, obj) TypeError: %s — пробуем обратный порядок", e)
-        except Exception as e:
-            logger.debug("vdf.binary_dump(fp, obj) failed: %s", e)
+    # пытаемся вызвать наиболее вероятную сигнатуру: binary_dump(fp, obj)
+    buf = io.BytesIO()
+    try:
+        vdf.binary_dump(buf, shortcuts_obj)
+        return buf.getvalue()
+    except TypeError as e:
+        logger.debug("vdf.binary_dump(fp, obj) TypeError: %s — пробуем обратный порядок", e)
+    except Exception as e:
+        logger.debug("vdf.binary_dump(fp, obj) failed: %s", e)
+
+    # fallback: binary_dump(obj, fp)
+    buf = io.BytesIO()
+    try:
+        vdf.binary_dump(shortcuts_obj, buf)
+        return buf.getvalue()
+    except Exception as e:
+        logger.error("vdf.binary_dump failed с обеих сигнатур: %s", e)
+        raise
 
-        # fallback: binary_dump(obj, fp)
-        try:
-            vdf.binary_dump(shortcuts_obj, fp)
-            return
-        except Exception as e:
-            logger.error("vdf.binary_dump failed с обеих сигнатур: %s", e)
-            raise
 
-    atomic_write_file_with_vdf(path, writer)
+def dump_shortcuts_binary(path: Path, shortcuts_obj: Dict, expected_sha256: Optional[bytes] = None):
+    """
+    Корректная запись бинарного VDF: сериализуем в память и отдаём файлу одним write(),
+    вместо множества мелких записей на каждый ключ. Производим атомарную запись
+    через atomic_write_file_with_vdf (с проверкой expected_sha256, если задан).
+    """
+    data = serialize_shortcuts_binary(shortcuts_obj)
+
+    def writer(fp):
+        fp.write(data)
+
+    atomic_write_file_with_vdf(path, writer, expected_sha256, size_hint=len(data))
     logger.info("shortcuts.vdf записан: %s", path)
 
 
+# размеры значений фиксированной длины в бинарном VDF: int32, float32, pointer, color, uint64, int64
+_BVDF_FIXED_SIZES = {0x02: 4, 0x03: 4, 0x04: 4, 0x06: 4, 0x07: 8, 0x0A: 8}
+_BVDF_MAP, _BVDF_STRING, _BVDF_WSTRING, _BVDF_END = 0x00, 0x01, 0x05, 0x08
+_SHORTCUTS_HEADER = b"\x00shortcuts\x00"
+
+
+def _skip_binary_vdf_value(data: bytes, pos: int, vtype: int) -> int:
+    """Пропускает значение типа vtype, начинающееся с pos; возвращает позицию после него."""
+    if vtype == _BVDF_MAP:
+        while data[pos] != _BVDF_END:
+            t = data[pos]
+            pos = data.index(b"\x00", pos + 1) + 1  # ключ
+            pos = _skip_binary_vdf_value(data, pos, t)
+        return pos + 1
+    if vtype == _BVDF_STRING:
+        return data.index(b"\x00", pos) + 1
+    if vtype == _BVDF_WSTRING:
+        while data[pos:pos + 2] != b"\x00\x00":
+            pos += 2
+        return pos + 2
+    if vtype in _BVDF_FIXED_SIZES:
+        return pos + _BVDF_FIXED_SIZES[vtype]
+    raise ValueError(f"Неизвестный тип бинарного VDF: {vtype:#x}")
+
+
+def _next_shortcut_index(data: bytes) -> int:
+    """Обходит верхний уровень map "shortcuts" без построения dict; возвращает max(индекс) + 1."""
+    pos = len(_SHORTCUTS_HEADER)
+    next_idx = 0
+    while data[pos] != _BVDF_END:
+        t = data[pos]
+        key_end = data.index(b"\x00", pos + 1)
+        key = data[pos + 1:key_end]
+        if key.isdigit():
+            next_idx = max(next_idx, int(key) + 1)
+        pos = _skip_binary_vdf_value(data, key_end + 1, t)
+    if pos != len(data) - 2:
+        raise ValueError("Неожиданные данные после map shortcuts")
+    return next_idx
+
+
+def append_shortcuts_binary(path: Path, entries: List[Dict]) -> Optional[List[str]]:
+    """
+    Быстрый путь для больших shortcuts.vdf: сериализуются только новые записи и вклеиваются
+    перед двумя завершающими 0x08 (конец "shortcuts" и корня), без полного разбора и
+    пересборки всех записей. Возвращает присвоенные индексы или None, если быстрый путь
+    неприменим (файл мал, отсутствует или имеет неожиданную структуру).
+    """
+    try:
+        if path.stat().st_size <= APPEND_FAST_PATH_MIN_SIZE:
+            return None
+        data = path.read_bytes()
+        if not data.startswith(_SHORTCUTS_HEADER) or not data.endswith(b"\x08\x08"):
+            return None
+        first_idx = _next_shortcut_index(data)
+    except (OSError, ValueError, IndexError) as e:
+        logger.debug("Быстрое добавление в %s неприменимо: %s", path, e)
+        return None
+
+    indexes = [str(first_idx + i) for i in range(len(entries))]
+    # binary_dump({idx: entry, ...}) = <записи> + 0x08 корня; корневой терминатор отбрасываем
+    chunk = serialize_shortcuts_binary(dict(zip(indexes, entries)))[:-1]
+    new_data = data[:-2] + chunk + b"\x08\x08"
+
+    def writer(fp):
+        fp.write(new_data)
+
+    atomic_write_file_with_vdf(path, writer, hashlib.sha256(data).digest(), size_hint=len(new_data))
+    logger.info("Записи %s добавлены в shortcuts.vdf без пересборки: %s", ", ".join(indexes), path)
+    return indexes
+
+
+def is_file_locked(path: Path) -> bool:
+    """
+    Дешёвая проверка, удерживается ли файл другим процессом.
+    Windows: rename файла в самого себя падает с PermissionError, если файл открыт.
+    POSIX: неблокирующий эксклюзивный flock, сразу же отпускаемый.
+    """
+    if not path.exists():
+        return False
+    try:
+        if os.name == "nt":
+            os.rename(path, path)
+            return False
+        with path.open("rb+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return False
+    except OSError:
+        return True
+
+
+def wait_until_unlocked(path: Path, timeout: float = LOCK_WAIT_TIMEOUT, interval: float = LOCK_POLL_INTERVAL) -> bool:
+    """Опрашивает блокировку файла каждые interval секунд; True если файл освободился за timeout."""
+    deadline = time.monotonic() + timeout
+    while is_file_locked(path):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
 # ---- Steam detection and control utilities ----
 
+@functools.lru_cache(maxsize=1)
 def detect_steam_variant() -> str:
     """
     Определяет вариант Steam:
        'windows', 'linux_flatpak', 'linux_native', 'darwin_native', 'unknown'
+    Результат кэшируется на время жизни процесса (flatpak info вызывается один раз).
     """
     system = platform.system().lower()
     if system.startswith("windows"):
@@ -229,18 +606,54 @@ def detect_steam_variant() -> str:
     return "unknown"
 
 
+# имена процессов клиента Steam по вариантам (для linux_flatpak сверяется командная строка);
+# одни и те же наборы используются и в psutil, и в pgrep/tasklist, чтобы результат не зависел от psutil
+_STEAM_PROCESS_NAMES = {
+    "windows": {"steam.exe"},
+    "darwin_native": {"steam_osx", "steam", "steamwebhelper"},
+}
+_STEAM_PROCESS_NAMES_DEFAULT = {"steam", "steamwebhelper"}
+_FLATPAK_STEAM_ID = "com.valvesoftware.Steam"
+
+
+def _is_steam_running_psutil(variant: str) -> bool:
+    """Проверка через psutil без запуска подпроцессов (те же критерии, что и у pgrep/tasklist)."""
+    if variant == "linux_flatpak":
+        for p in psutil.process_iter(["cmdline"]):
+            cmdline = p.info.get("cmdline") or []
+            if any(_FLATPAK_STEAM_ID in arg for arg in cmdline):
+                return True
+        return False
+    names = _STEAM_PROCESS_NAMES.get(variant, _STEAM_PROCESS_NAMES_DEFAULT)
+    for p in psutil.process_iter(["name"]):
+        name = p.info.get("name")
+        if name and name.lower() in names:
+            return True
+    return False
+
+
 def is_steam_running(variant: str) -> bool:
-    """Проверяет наличие процессов Steam в системе."""
+    """Проверяет наличие процессов Steam в системе (через psutil, иначе pgrep/tasklist)."""
+    if PSUTIL_AVAILABLE:
+        try:
+            return _is_steam_running_psutil(variant)
+        except Exception as e:
+            logger.debug("psutil.process_iter failed: %s — fallback на subprocess", e)
     try:
         if variant == "windows":
             out = subprocess.run(["tasklist", "/FI", "IMAGENAME eq steam.exe"], capture_output=True, text=True)
             return "steam.exe" in out.stdout.lower()
         if variant == "linux_flatpak":
-            out = subprocess.run(["pgrep", "-f", "com.valvesoftware.Steam"], capture_output=True)
+            out = subprocess.run(["pgrep", "-f", _FLATPAK_STEAM_ID], capture_output=True)
             return out.returncode == 0
-        # linux_native и darwin_native
-        out = subprocess.run(["pgrep", "-f", "steam"], capture_output=True)
-        return out.returncode == 0
+        # linux_native и darwin_native: точное совпадение имени процесса без учёта регистра
+        names = _STEAM_PROCESS_NAMES.get(variant, _STEAM_PROCESS_NAMES_DEFAULT)
+        # procps pgrep отвергает шаблоны длиннее 15 символов, поэтому по одному имени за вызов
+        for name in sorted(names):
+            out = subprocess.run(["pgrep", "-i", "-x", name], capture_output=True)
+            if out.returncode == 0:
+                return True
+        return False
     except Exception:
         return False
 
@@ -335,7 +748,7 @@ class NonSteamGameAdder:
     def __init__(self, steam_dir: Optional[Path] = None, api_key: Optional[str] = None):
         self.steam_dir = steam_dir or default_steam_userdata_path()
         self.api_key = api_key or get_api_key()
-        self.session = requests_session_with_retries()
+        self.session = get_shared_session()
 
     def _user_path(self, user_id: str) -> Path:
         return self.steam_dir / user_id
@@ -346,22 +759,21 @@ class NonSteamGameAdder:
         if not self.steam_dir.exists():
             logger.warning("Steam userdata path не найден: %s", self.steam_dir)
             return out
-        for d in self.steam_dir.iterdir():
-            if not d.is_dir():
-                continue
-            uid = d.name
-            lc = d / "config" / "localconfig.vdf"
-            if lc.exists():
-                try:
-                    with lc.open("r", encoding="utf-8", errors="replace") as f:
-                        data = vdf.load(f)
-                        username = data.get("UserLocalConfigStore", {}).get("friends", {}).get("PersonaName", "Unknown")
-                        out[uid] = username
-                except Exception as e:
-                    logger.debug("Парсинг %s failed: %s", lc, e)
+        # os.scandir: DirEntry.is_dir() берётся из readdir без отдельного stat на каждую запись
+        with os.scandir(self.steam_dir) as it:
+            for d in it:
+                if not d.is_dir(follow_symlinks=False):
+                    continue
+                uid = d.name
+                lc = os.path.join(d.path, "config", "localconfig.vdf")
+                if os.path.exists(lc):
+                    try:
+                        out[uid] = read_persona_name(lc)
+                    except Exception as e:
+                        logger.debug("Парсинг %s failed: %s", lc, e)
+                        out[uid] = "Unknown"
+                else:
                     out[uid] = "Unknown"
-            else:
-                out[uid] = "Unknown"
         return out
 
     def get_current_steam_user(self) -> Optional[Tuple[str, Dict]]:
@@ -379,118 +791,182 @@ class NonSteamGameAdder:
             logger.debug("Failed to parse loginusers.vdf: %s", e)
         return None
 
+    def _get_api_json(self, url: str) -> Optional[Dict]:
+        """GET к SteamGridDB API с кэшированием успешных ответов по URL."""
+        payload = load_cached_json(url)
+        if payload is not None:
+            logger.debug("Cache hit: %s", url)
+            return payload
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        r = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        logger.debug("GET %s -> HTTP %s", url, r.status_code)
+        if r.status_code != 200:
+            return None
+        payload = r.json()
+        if payload.get("success"):
+            store_cached_json(url, payload)
+        return payload
+
     def fetch_steamgriddb_image_url(self, game_id: int, image_type: str) -> Optional[str]:
         """Запрашивает SteamGridDB API и возвращает URL первой подходящей картинки (или None)."""
         if not self.api_key:
             return None
-        headers = {"Authorization": f"Bearer {self.api_key}"}
+        if image_type == "wide_grid":
+            return self._fetch_grid_url(game_id, GRID_WIDE_DIMENSIONS)
         if image_type == "hero":
             url = f"https://www.steamgriddb.com/api/v2/heroes/game/{game_id}"
         elif image_type == "icon":
             url = f"https://www.steamgriddb.com/api/v2/icons/game/{game_id}"
-        elif image_type == "wide_grid":
-            url = f"https://www.steamgriddb.com/api/v2/grids/game/{game_id}?dimensions=920x430"
         else:
             url = f"https://www.steamgriddb.com/api/v2/{image_type}s/game/{game_id}"
         try:
-            r = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
-            logger.info("Fetching %s for %s -> HTTP %s", image_type, game_id, r.status_code)
-            if r.status_code == 200:
-                payload = r.json()
-                if payload.get("success") and payload.get("data"):
-                    return payload["data"][0].get("url")
+            payload = self._get_api_json(url)
+            logger.info("Fetching %s for %s -> %s", image_type, game_id, "ok" if payload else "no data")
+            if payload and payload.get("success") and payload.get("data"):
+                return payload["data"][0].get("url")
         except Exception as e:
             logger.debug("fetch_steamgriddb_image_url exception: %s", e)
         return None
 
+    def _fetch_grid_url(self, game_id: int, dimensions: Tuple[str, ...]) -> Optional[str]:
+        """URL первой сетки с одним из указанных размеров (отдельный запрос к /grids)."""
+        url = f"https://www.steamgriddb.com/api/v2/grids/game/{game_id}?dimensions={','.join(dimensions)}"
+        try:
+            payload = self._get_api_json(url)
+            if payload and payload.get("success") and payload.get("data"):
+                return payload["data"][0].get("url")
+        except Exception as e:
+            logger.debug("_fetch_grid_url exception: %s", e)
+        return None
+
+    def fetch_grid_urls(self, game_id: int) -> Dict[str, Optional[str]]:
+        """
+        Один запрос к /grids с dimensions= сразу для вертикальной и широкой сетки (вместо двух);
+        возвращает {"grid": url|None, "wide_grid": url|None}. Ответ постраничный, поэтому если
+        какой-то ориентации нет на первой странице — добираем её отдельным запросом по размерам.
+        """
+        out: Dict[str, Optional[str]] = {"grid": None, "wide_grid": None}
+        if not self.api_key:
+            return out
+        dims = ",".join(GRID_PORTRAIT_DIMENSIONS + GRID_WIDE_DIMENSIONS)
+        url = f"https://www.steamgriddb.com/api/v2/grids/game/{game_id}?dimensions={dims}"
+        try:
+            payload = self._get_api_json(url)
+            logger.info("Fetching grid+wide_grid for %s -> %s", game_id, "ok" if payload else "no data")
+            if payload and payload.get("success"):
+                for item in payload.get("data") or []:
+                    size = f"{item.get('width')}x{item.get('height')}"
+                    if out["grid"] is None and size in GRID_PORTRAIT_DIMENSIONS:
+                        out["grid"] = item.get("url")
+                    elif out["wide_grid"] is None and size in GRID_WIDE_DIMENSIONS:
+                        out["wide_grid"] = item.get("url")
+                    if out["grid"] and out["wide_grid"]:
+                        break
+        except Exception as e:
+            logger.debug("fetch_grid_urls exception: %s", e)
+        if out["grid"] is None:
+            out["grid"] = self._fetch_grid_url(game_id, GRID_PORTRAIT_DIMENSIONS)
+        if out["wide_grid"] is None:
+            out["wide_grid"] = self._fetch_grid_url(game_id, GRID_WIDE_DIMENSIONS)
+        return out
+
     def download_image(self, url: str, out_path: Path, resize_to: Optional[Tuple[int, int]] = None) -> bool:
-        """Скачивание изображения и опциональный ресайз через PIL."""
+        """Потоковое скачивание изображения (без буферизации всего тела в памяти) и опциональный ресайз через PIL."""
+        tmp_path: Optional[Path] = None
         try:
-            r = self.session.get(url, timeout=HTTP_TIMEOUT)
-            if r.status_code != 200:
-                logger.debug("Image download failed %s -> %s", url, r.status_code)
-                return False
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            with out_path.open("wb") as f:
-                f.write(r.content)
+            with self.session.get(url, stream=True, timeout=HTTP_TIMEOUT) as r:
+                if r.status_code != 200:
+                    logger.debug("Image download failed %s -> %s", url, r.status_code)
+                    return False
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                # качаем во временный файл рядом и подменяем только после полной загрузки,
+                # чтобы обрыв соединения не оставил (или не затёр) битую картинку
+                with tempfile.NamedTemporaryFile(dir=str(out_path.parent), delete=False) as tf:
+                    tmp_path = Path(tf.name)
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        tf.write(chunk)
+                tmp_path.replace(out_path)
+                tmp_path = None
             logger.info("Downloaded image %s", out_path)
             if resize_to:
                 try:
                     with Image.open(out_path) as img:
-                        img = img.convert("RGBA").resize(resize_to, Image.Resampling.LANCZOS)
-                        img.save(out_path, format="PNG")
+                        if img.format == "JPEG":
+                            img.draft("RGB", resize_to)  # декодирование JPEG сразу в 1/2, 1/4 или 1/8 размера
+                        # до thumbnail: для режимов P и 1 Pillow принудительно ресайзит NEAREST
+                        if img.mode != "RGBA":
+                            img = img.convert("RGBA")
+                        img.thumbnail((resize_to[0] * 2, resize_to[1] * 2), Image.Resampling.BILINEAR)
+                        img = img.resize(resize_to, Image.Resampling.LANCZOS)
+                        # кэш-файл сетки Steam: быстрое сжатие важнее размера
+                        img.save(out_path, format="PNG", optimize=False, compress_level=1)
                     logger.info("Resized %s to %s", out_path, resize_to)
                 except Exception as e:
                     logger.warning("Failed to resize %s: %s", out_path, e)
             return True
         except Exception as e:
             logger.debug("download_image exception: %s", e)
+            if tmp_path is not None:
+                try:
+                    tmp_path.unlink(missing_ok=True)
+                except Exception:
+                    pass
             return False
 
     def save_images_to_grid(self, app_id: str, game_id: int, user_id: str):
-        """Сохранение набора изображений в userdata/<user>/config/grid."""
+        """
+        Сохранение набора изображений в userdata/<user>/config/grid.
+        Обе сетки берутся одним запросом (fetch_grid_urls), hero/logo/icon — отдельными эндпоинтами;
+        запросы метаданных и загрузки выполняются параллельно в пуле потоков.
+        """
         grid_folder = self._user_path(user_id) / "config" / "grid"
         grid_folder.mkdir(parents=True, exist_ok=True)
-        types = ["grid", "wide_grid", "hero", "logo", "icon"]
-        for t in types:
-            url = self.fetch_steamgriddb_image_url(game_id, t)
-            if not url:
-                continue
+
+        def fetch_one(t: str) -> Dict[str, Optional[str]]:
+            return {t: self.fetch_steamgriddb_image_url(game_id, t)}
+
+        def out_path_for(t: str, url: str) -> Path:
             ext = Path(url).suffix or ".png"
             if t == "grid":
-                out = grid_folder / f"{app_id}p{ext}"
-            elif t == "wide_grid":
-                out = grid_folder / f"{app_id}{ext}"
-            else:
-                out = grid_folder / f"{app_id}_{t}{ext}"
-            if t == "icon":
-                self.download_image(url, out, resize_to=(64, 64))
-            else:
-                self.download_image(url, out)
+                return grid_folder / f"{app_id}p{ext}"
+            if t == "wide_grid":
+                return grid_folder / f"{app_id}{ext}"
+            return grid_folder / f"{app_id}_{t}{ext}"
+
+        with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+            url_futures = [pool.submit(self.fetch_grid_urls, game_id)]
+            url_futures += [pool.submit(fetch_one, t) for t in ("hero", "logo", "icon")]
+            downloads = []
+            for fut in as_completed(url_futures):
+                for t, url in fut.result().items():
+                    if not url:
+                        continue
+                    resize = (64, 64) if t == "icon" else None
+                    downloads.append(pool.submit(self.download_image, url, out_path_for(t, url), resize))
+            for fut in as_completed(downloads):
+                fut.result()
 
     def search_game_on_steamgriddb(self, game_name: str) -> Optional[int]:
         """Autocomplete поиск на SteamGridDB; возвращает game_id первого результата."""
         if not self.api_key:
             return None
         url = f"https://www.steamgriddb.com/api/v2/search/autocomplete/{requests.utils.requote_uri(game_name)}"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
         try:
-            r = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
-            if r.status_code == 200:
-                payload = r.json()
-                if payload.get("success") and payload.get("data"):
-                    return int(payload["data"][0]["id"])
+            payload = self._get_api_json(url)
+            if payload and payload.get("success") and payload.get("data"):
+                return int(payload["data"][0]["id"])
         except Exception as e:
             logger.debug("search_game_on_steamgriddb exception: %s", e)
         return None
 
-    def add_non_steam_game(self, game_exe_path: str, game_name: str, user_id: str, launch_options: str = "") -> Dict:
-        """
-        Основной метод: генерирует appid, пытается скачать изображения, и добавляет запись в shortcuts.vdf.
-        Перед записью выполняет проверку/перезапуск Steam, чтобы избежать блокировок файла.
-        """
+    def _prepare_shortcut(self, game_exe_path: str, game_name: str, launch_options: str) -> Tuple[str, Dict]:
+        """Проверяет exe и формирует (app_id, запись shortcuts.vdf)."""
         exe = str(Path(game_exe_path).expanduser())
         if not Path(exe).exists():
             raise FileNotFoundError(f"Game exe not found: {exe}")
 
         app_id = generate_appid(game_name, exe)
         game_path = str(Path(exe).parent)
-
-        # Попытка найти game_id и скачать картинки
-        game_id = self.search_game_on_steamgriddb(game_name)
-        if game_id:
-            logger.info("Найден game_id %s; скачиваем изображения.", game_id)
-            self.save_images_to_grid(app_id, game_id, user_id)
-        else:
-            logger.debug("game_id не найден или API недоступен; пропускаем скачивание картинок.")
-
-        # Подготовка объекта shortcuts
-        shortcuts_file = self._user_path(user_id) / "config" / "shortcuts.vdf"
-        try:
-            shortcuts = load_shortcuts_binary(shortcuts_file)
-        except Exception:
-            shortcuts = {"shortcuts": {}}
-
         entry = {
             "appid": app_id,
             "appname": game_name,
@@ -505,21 +981,135 @@ class NonSteamGameAdder:
             "LastPlayTime": 0,
             "tags": {}
         }
+        return app_id, entry
+
+    def fetch_artwork(self, app_id: str, game_name: str, user_id: str):
+        """Ищет игру на SteamGridDB и скачивает изображения в grid пользователя."""
+        game_id = self.search_game_on_steamgriddb(game_name)
+        if game_id:
+            logger.info("Найден game_id %s; скачиваем изображения.", game_id)
+            self.save_images_to_grid(app_id, game_id, user_id)
+        else:
+            logger.debug("game_id не найден или API недоступен; пропускаем скачивание картинок.")
 
-        idx = len(shortcuts.get("shortcuts", {}))
-        shortcuts.setdefault("shortcuts", {})[str(idx)] = entry
+    def _shortcuts_path(self, user_id: str) -> Path:
+        return self._user_path(user_id) / "config" / "shortcuts.vdf"
+
+    def write_shortcuts(self, user_id: str, entries: List[Dict], allow_restart: bool = True):
+        """
+        Добавляет записи в shortcuts.vdf пользователя за один read-modify-write.
+        Если shortcuts.vdf заблокирован — перезапускает Steam (если allow_restart) и ждёт освобождения файла.
+        """
+        shortcuts_file = self._shortcuts_path(user_id)
+
+        # --- Перезапускаем Steam только если shortcuts.vdf действительно заблокирован ---
+        # (короткое ожидание: мгновенный flock другого экземпляра скрипта не повод перезапускать Steam)
+        if not wait_until_unlocked(shortcuts_file, timeout=PRECONDITION_LOCK_TIMEOUT * 2):
+            variant, restarted = restart_steam_if_running(prompt_before_restart=False, allow_restart=allow_restart)
+            if restarted:
+                logger.info("Steam перезапущен (%s) для освобождения блокировок файлов.", variant)
+                if not wait_until_unlocked(shortcuts_file):
+                    logger.warning("shortcuts.vdf всё ещё заблокирован после перезапуска Steam.")
+
+        # read-modify-write с проверкой SHA-256: если файл переписал Steam или другой
+        # экземпляр скрипта, перечитываем и повторяем
+        for attempt in range(1, SHORTCUTS_WRITE_ATTEMPTS + 1):
+            try:
+                if append_shortcuts_binary(shortcuts_file, entries) is None:
+                    # Полный путь: загрузка, добавление записей, сериализация и атомарная запись
+                    try:
+                        shortcuts, sha = load_shortcuts_binary(shortcuts_file)
+                    except Exception:
+                        shortcuts, sha = {"shortcuts": {}}, file_sha256(shortcuts_file)
+                    existing = shortcuts.setdefault("shortcuts", {})
+                    idx = len(existing)
+                    for i, entry in enumerate(entries):
+                        existing[str(idx + i)] = entry
+                    dump_shortcuts_binary(shortcuts_file, shortcuts, expected_sha256=sha)
+                return
+            except StalePrecondition as e:
+                if attempt == SHORTCUTS_WRITE_ATTEMPTS:
+                    raise
+                logger.warning("%s; повтор %d/%d", e, attempt + 1, SHORTCUTS_WRITE_ATTEMPTS)
+
+    def write_shortcut(self, user_id: str, entry: Dict):
+        """Добавляет одну запись в shortcuts.vdf пользователя (см. write_shortcuts)."""
+        self.write_shortcuts(user_id, [entry])
 
-        # --- Перед записью пытаемся перезапустить Steam, чтобы освободить locks на shortcuts.vdf ---
-        variant, restarted = restart_steam_if_running(prompt_before_restart=False, allow_restart=True)
-        if restarted:
-            logger.info("Steam перезапущен (%s) для освобождения блокировок файлов.", variant)
-            time.sleep(2.0)  # дать время процессу подняться/опуститься
+    def add_non_steam_game(self, game_exe_path: str, game_name: str, user_id: str, launch_options: str = "") -> Dict:
+        """
+        Основной метод: генерирует appid, пытается скачать изображения, и добавляет запись в shortcuts.vdf.
+        """
+        app_id, entry = self._prepare_shortcut(game_exe_path, game_name, launch_options)
+        self.fetch_artwork(app_id, game_name, user_id)
+        self.write_shortcut(user_id, entry)
+        logger.info("Добавлена игра %s с appid %s для пользователя %s", game_name, app_id, user_id)
+        return {"status": "success", "app_id": app_id}
 
-        # Сериализация и атомарная запись
-        dump_shortcuts_binary(shortcuts_file, shortcuts)
+    def add_non_steam_games(self, games: Iterable[Tuple[str, str, str]], user_id: str) -> List[Dict]:
+        """
+        Пакетное добавление игр (exe, name, launch_options): арт-ресурсы качаются для каждой игры,
+        а shortcuts.vdf читается/пишется (и Steam при необходимости перезапускается) один раз на весь пакет.
+        Игры с отсутствующим exe пропускаются с ошибкой в результате.
+        """
+        results: List[Dict] = []
+        entries: List[Dict] = []
+        for exe, name, launch in games:
+            try:
+                app_id, entry = self._prepare_shortcut(exe, name, launch)
+            except FileNotFoundError as e:
+                logger.error("%s; пропускаем %s", e, name)
+                results.append({"status": "error", "name": name, "error": str(e)})
+                continue
+            self.fetch_artwork(app_id, name, user_id)
+            entries.append(entry)
+            results.append({"status": "success", "name": name, "app_id": app_id})
+        if entries:
+            self.write_shortcuts(user_id, entries)
+            logger.info("Добавлено игр: %d для пользователя %s", len(entries), user_id)
+        return results
+
+    async def add_non_steam_game_async(self, game_exe_path: str, game_name: str, user_id: str,
+                                       launch_options: str = "") -> Dict:
+        """
+        Асинхронный вариант add_non_steam_game: загрузка арт-ресурсов и запись shortcuts.vdf
+        выполняются одновременно (asyncio.gather поверх пула потоков, сетевой слой остаётся
+        на общей requests.Session). Если shortcuts.vdf заблокирован и понадобится перезапуск
+        Steam — сначала дожидаемся картинок, иначе Steam поднимется без новых арт-ресурсов.
+        """
+        app_id, entry = self._prepare_shortcut(game_exe_path, game_name, launch_options)
+        loop = asyncio.get_running_loop()
+        artwork = loop.run_in_executor(None, self.fetch_artwork, app_id, game_name, user_id)
+        locked = await loop.run_in_executor(None, is_file_locked, self._shortcuts_path(user_id))
+        if locked:
+            await artwork
+            await loop.run_in_executor(None, self.write_shortcut, user_id, entry)
+        else:
+            await asyncio.gather(
+                artwork,
+                loop.run_in_executor(None, functools.partial(self.write_shortcuts, user_id, [entry],
+                                                             allow_restart=False)),
+            )
         logger.info("Добавлена игра %s с appid %s для пользователя %s", game_name, app_id, user_id)
         return {"status": "success", "app_id": app_id}
 
+    def interactive(self) -> Optional[Dict]:
+        """Интерактивный режим: запрашивает exe, имя и параметры запуска через input()."""
+        exe = input("Enter the path to your game executable:\n> ").strip()
+        name = input("Enter the name of the game:\n> ").strip()
+        launch = input("Enter launch options or press Enter to skip:\n> ").strip()
+
+        if not exe or not name:
+            logger.error("Exe path and game name are required.")
+            return None
+
+        user_id = choose_user_interactively(self)
+        if not user_id:
+            logger.error("No Steam user selected; aborting.")
+            return None
+
+        return self.add_non_steam_game(exe, name, user_id, launch)
+
 
 # ---- пользовательский интерфейс (CLI) ----
 
@@ -548,33 +1138,84 @@ def choose_user_interactively(adder: NonSteamGameAdder) -> Optional[str]:
             print("Invalid selection.")
 
 
-def main():
+def read_games_csv(csv_path: Path) -> List[Tuple[str, str, str]]:
+    """Читает CSV со строками exe,name[,launch]; пустые строки, '#'-комментарии и заголовок пропускаются."""
+    games: List[Tuple[str, str, str]] = []
+    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            if row[0].strip().lower() == "exe":
+                continue
+            if len(row) < 2 or not row[1].strip():
+                logger.warning("Пропущена строка CSV без имени игры: %s", row)
+                continue
+            launch = row[2].strip() if len(row) > 2 else ""
+            games.append((row[0].strip(), row[1].strip(), launch))
+    return games
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Add non-Steam games to Steam with SteamGridDB artwork.")
+    sub = parser.add_subparsers(dest="command")
+
+    add = sub.add_parser("add", help="add a single game")
+    add.add_argument("--exe", required=True, help="path to the game executable")
+    add.add_argument("--name", required=True, help="game name")
+    add.add_argument("--launch", default="", help="launch options")
+    add.add_argument("--user", help="Steam user id (userdata folder name)")
+
+    batch = sub.add_parser("batch", help="add games from a CSV file (exe,name[,launch]) in one pass")
+    batch.add_argument("--csv", required=True, type=Path, help="CSV file with exe,name[,launch] rows")
+    batch.add_argument("--user", help="Steam user id (userdata folder name)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа CLI; возвращает код завершения процесса (0 — успех)."""
+    args = build_arg_parser().parse_args(argv)
     try:
         steam_path_env = os.environ.get("STEAM_USERDATA")
         api_key = get_api_key(interactive_save=True)
         adder = NonSteamGameAdder(steam_dir=Path(steam_path_env) if steam_path_env else None, api_key=api_key)
 
-        exe = input("Enter the path to your game executable:\n> ").strip()
-        name = input("Enter the name of the game:\n> ").strip()
-        launch = input("Enter launch options or press Enter to skip:\n> ").strip()
+        if args.command is None:
+            res = adder.interactive()
+            if not res:
+                return 1
+            logger.info("Result: %s", res)
+            return 0
 
-        if not exe or not name:
-            logger.error("Exe path and game name are required.")
-            return
-
-        user_id = choose_user_interactively(adder)
+        user_id = args.user or choose_user_interactively(adder)
         if not user_id:
             logger.error("No Steam user selected; aborting.")
-            return
-
-        res = adder.add_non_steam_game(exe, name, user_id, launch)
-        logger.info("Result: %s", res)
+            return 1
+
+        if args.command == "add":
+            res = adder.add_non_steam_game(args.exe, args.name, user_id, args.launch)
+            logger.info("Result: %s", res)
+            return 0
+        if args.command == "batch":
+            games = read_games_csv(args.csv)
+            if not games:
+                logger.error("No games found in %s", args.csv)
+                return 1
+            results = adder.add_non_steam_games(games, user_id)
+            for res in results:
+                logger.info("Result: %s", res)
+            return 1 if any(r.get("status") == "error" for r in results) else 0
+        return 1
 
     except KeyboardInterrupt:
         logger.info("Interrupted by user.")
+        return 130
+    except FileNotFoundError as e:
+        logger.error("%s", e)
+        return 1
     except Exception as e:
         logger.exception("Unexpected error: %s", e)
+        return 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())